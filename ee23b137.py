@@ -8,9 +8,11 @@
 #               for better visuals consider changing the following
 #               parameters:
 #               - mesh_granularity: 1000 will give a finer heatmap,
-#                                   current is 100
+#                                   current is 200, set it with --mesh
 #
 ###################################################################
+import os
+import time
 import string
 import argparse
 import xml.etree.ElementTree as ET
@@ -19,9 +21,16 @@ from xml.etree.ElementTree import Element
 
 import matplotlib.colors as colors
 import matplotlib.patches as patches
+from matplotlib.collections import PatchCollection
 import matplotlib.pyplot as plt
 import numpy as np
-from scipy.stats import gaussian_kde
+
+# keep the compiled kernels across runs so that
+# only the very first run pays for compiling them
+os.environ.setdefault(
+    "NUMBA_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "onehotkeyboard")
+)
+from numba import njit
 
 class Tags(str, Enum):
     """
@@ -35,31 +44,6 @@ class Tags(str, Enum):
     Y = "y"
 
 
-def get_keys(node: Element):
-    """
-    @brief: convenience function for getting 
-    key child from given node
-    """
-    if node.tag != Tags.Row:
-        raise ValueError(
-            f"get_keys should be called with node.tag = {Tags.Row}, node is ", node.tag
-        )
-    return node.iter(Tags.Key)
-
-
-def get_rows(node: Element):
-    """
-    @brief: convenience function for getting 
-    row child from given node
-    """
-    if node.tag != Tags.Keyboard:
-        raise ValueError(
-            f"get_rows should be called with node.tag = {Tags.Keyboard}, node is ",
-            node.tag,
-        )
-    return node.iter(Tags.Row)
-
-
 def get_positions(node: Element):
     """
     @brief: convenience function for getting 
@@ -71,11 +55,11 @@ def get_positions(node: Element):
             node.tag,
         )
     position = node.findall(Tags.Position)
-    if position is None:
-        raise ValueError(f"no position specified for {node.get('char')}")
+    if not position:
+        raise ValueError(f"no position specified for {node.get('lower')}")
     if len(position) > 1:
         print(
-            f"multiple positions given for {node.get('char')}, dropping all except first"
+            f"multiple positions given for {node.get('lower')}, dropping all except first"
         )
     return position[0]
 
@@ -112,19 +96,44 @@ def get_y(node: Element):
     return float(elem.text)
 
 
-def find_nested_key(nested_dict, key):
+# compiled when the module is loaded since the
+# signature is given, so the first keypress never waits
+@njit("void(float64[:, :], float64[:, :], int64, int64)", cache=True)
+def splat_stamp(H, stamp, ix, iy):
     """
-    @brief: finds the given key in a nested dictionary.
-    @params: nested_dict should be of the form
-    {row: {nested-dict}, row2: {another-nested-dict}}
+    @brief: adds stamp to H centered at the cell (ix, iy),
+    the parts of the stamp outside H are dropped
     """
-    for dict in nested_dict.values():
-        try:
-            val = dict[key]
-            return val
-        except:
+    ry = stamp.shape[0] // 2
+    rx = stamp.shape[1] // 2
+    for j in range(stamp.shape[0]):
+        y = iy - ry + j
+        if y < 0 or y >= H.shape[0]:
             continue
-    return
+        for i in range(stamp.shape[1]):
+            x = ix - rx + i
+            if 0 <= x < H.shape[1]:
+                H[y, x] += stamp[j, i]
+
+
+@njit("float64(int64[:], int64[:, :, :], float64[:], float64[:, :], float64[:, :])", cache=True)
+def process_keys(codes, key_cells, key_dist, H, stamp):
+    """
+    @brief: adds the stamps for a batch of key presses
+    to H and returns the distance travelled for them.
+    @params: codes are indices into key_cells and key_dist,
+    key_cells[code] holds the (x, y) cells to stamp,
+    unused ones are -1
+    """
+    dist = 0.0
+    for code in codes:
+        for k in range(key_cells.shape[1]):
+            ix = key_cells[code, k, 0]
+            if ix < 0:
+                continue
+            splat_stamp(H, stamp, ix, key_cells[code, k, 1])
+        dist += key_dist[code]
+    return dist
 
 
 class xmlParser:
@@ -135,8 +144,6 @@ class xmlParser:
     """
     def __init__(self, filename: string):
         try:
-            self.tree = ET.parse(filename)
-            self.root = self.tree.getroot()
             self.special_keys = [
                 "shift_l",
                 "shift_r",
@@ -160,63 +167,78 @@ class xmlParser:
             # parse the file and create a dictionary of dictionaries
             # holding the whole keymap.
             # example: {row1: {key1:pos1, key2:pos2,...}, row2:...}
-            self.__generate_keymap()
+            # the tree is built in the same pass
+            self.__generate_keymap(filename)
         except Exception as e:  
             raise ValueError("failed to parse!", e)
             
 
-    def __generate_keymap(self):
+    def __generate_keymap(self, filename: string):
         """
-        @brief: generates the keymap as a nested dictionary
+        @brief: parses the file in a single pass and
+        generates the keymap as a nested dictionary
         """
         self.keymap = {}
         self.__reset_count()
-        for row in get_rows(self.root):
-            row_map = {}
-            for key in get_keys(row):
-                lower_key = self.__generate_keylist(key)
-                position = get_positions(key)
-                row_map[lower_key] = (get_x(position), get_y(position))
-            row_id = row.get("id")
-            if(row_id.lower()=="home"):
-                self.home_row.update(row_map)
-            # one may specify a row at different places in the file
-            # this will handle that
-            if row_id in self.keymap.keys():
-                self.keymap[row.get("id")].update(row_map)
-            else:
-                self.keymap[row.get("id")] = row_map
+        # row maps of the rows currently open,
+        # keys are added to the innermost one
+        rows = []
+        parse = ET.iterparse(filename, events=("start", "end"))
+        for event, elem in parse:
+            if event == "start":
+                if elem.tag == Tags.Row:
+                    rows.append({})
+                continue
+
+            if elem.tag == Tags.Key:
+                if not rows:
+                    # keys outside a row are not part of the layout
+                    continue
+                lower_key = self.__generate_keylist(elem)
+                position = get_positions(elem)
+                rows[-1][lower_key] = (get_x(position), get_y(position))
+            elif elem.tag == Tags.Row:
+                row_map = rows.pop()
+                row_id = elem.get("id")
+                if(row_id.lower()=="home"):
+                    self.home_row.update(row_map)
+                # one may specify a row at different places in the file
+                # this will handle that
+                if row_id in self.keymap.keys():
+                    self.keymap[row_id].update(row_map)
+                else:
+                    self.keymap[row_id] = row_map
+
+        self.root = parse.root
+        self.tree = ET.ElementTree(self.root)
+        if self.root.tag != Tags.Keyboard:
+            raise ValueError(
+                f"the root tag should be {Tags.Keyboard}, it is ", self.root.tag
+            )
         if not self.home_row:
             raise ValueError("Please specify the home row for your layout by setting the row tag as 'home'")
         self.is_generated = True
 
     def __reset_count(self):
         """
-        @brief: resets the char_count dictionary
-        the char_count array is required to check 
+        @brief: resets the set of seen charecters
+        the _seen set is required to check 
         for multiple definitions of keys
         """
-        self.char_count = {char: 0 for char in list(string.printable)}
-        for key in self.special_keys:
-            self.char_count[key] = 0
+        self._allowed = frozenset(string.printable).union(self.special_keys)
+        self._seen = set()
 
         self.is_generated = False
 
     def print_keymap(self):
         """
-        @brief: prints the keymap 
+        @brief: prints the keymap, as parsed
+        by __generate_keymap
         """
-        # if you have generated the keymap already
-        # reset and do it again
-        self.__reset_count()
-
-        for row in get_rows(self.root):
-            print(row.get("id"))
-            for key in get_keys(row):
-                lower_key = self.__generate_keylist(key)
-                position = get_positions(key)
-                print(lower_key, get_x(position), get_y(position))
-        self.is_generated = True
+        for row_id, row_map in self.keymap.items():
+            print(row_id)
+            for lower_key, (x, y) in row_map.items():
+                print(lower_key, x, y)
 
     def __default_shift(self):
         self.default_shift_mapping = {
@@ -269,10 +291,10 @@ class xmlParser:
         @brief: given a key tag, it checks for the 
         validity of the lower and upper charecter 
         and the position provided
-        since we keep a count of characters 
+        since we keep the seen characters 
         to check for multiple definitions
         this function should be called only if
-        the count array is 0. i.e. __reset_count() should
+        the seen set is empty. i.e. __reset_count() should
         be called after/before calling this function
         """
         if self.is_generated:
@@ -299,16 +321,16 @@ class xmlParser:
 
         # checking if the charecters are allowed characters
         char = keylist[0]
-        if char.lower() not in self.char_count.keys():
+        if char.lower() not in self._allowed:
             raise ValueError("Invalid key charecter ", char, node.find('pos')[0].text)
-        if self.char_count[char.lower()] > 1:
+        if char.lower() in self._seen:
             raise ValueError(
                 f"The key {char} is defined more than once, it can only be defined once"
             )
 
         # lowering so that user can provide 'Space' or 'sPace'
         # and the program won't complain.
-        self.char_count[char.lower()] += 1
+        self._seen.add(char.lower())
 
         if len(keylist) == 2:
             # the second charecter is the shifted version of the first
@@ -343,19 +365,27 @@ class xmlParser:
 
 
 class Painter:
-    def __init__(self, keymap: dict, shift_mapping: dict, home_row: dict):
+    def __init__(self, keymap: dict, shift_mapping: dict, home_row: dict, mesh_granularity: int = 200):
         self.keymap = keymap
         self.home_row = home_row
+        # home row positions as an array for
+        # computing the distance to all of them at once
+        self._home_xy = np.array(list(self.home_row.values()), dtype=np.float64)
         self.shift_mapping = shift_mapping
         # we adjust the keys to align them properly
         # saving the adjusted coordinates in this dictionary
         self.visual_keymap = {}
 
-        # since we are doing a density based 
-        # heatmap, we store the points 
-        # in these two lists
-        self.heatmap_pointsx = []
-        self.heatmap_pointsy = []
+        # every key press adds a small gaussian stamp
+        # to an accumulator grid, while the older ones
+        # fade away by this factor per charecter typed.
+        # a larger value means the heatmap is more
+        # gradual in change thus capturing more keypresses
+        # while smaller value means the heatmap changes
+        # fast and looks really cool 
+        self.decay = 0.9
+        # spread of the heat around a key
+        self.sigma = 0.8
 
         self.special_keys = {}
         self.special_keys[" "] = "space"
@@ -372,7 +402,7 @@ class Painter:
         self.yoffset = -self.ysize / 4
 
         # needed for drawing the 
-        # bounding box for pcolormesh
+        # bounding box for the heatmap
         self.xmax = 0.0
         self.ymax = 0.0 
 
@@ -407,25 +437,43 @@ class Painter:
         # this will be animated and drawn on top
         # of the static image 
 
-    	# NOTE: decrease this value if
+    	# NOTE: decrease mesh_granularity if
     	# the heatmap is rendered slowly 
-    	# on your machine. A value of 
-    	# 100 is ideal but on windows
-    	# it lags a bit on my machine at least
-        mesh_granularity = 1000
-        self.xi, self.yi = np.mgrid[
-            -1 : self.xmax : (self.xmax * mesh_granularity)**0.5 * 1j, -1 : self.ymax : (self.ymax * mesh_granularity)**0.5 * 1j
-        ]
-        
+    	# on your machine. The default of
+    	# 200 is much cheaper than 1000 and
+    	# looks nearly the same
+        nx = max(1, int((self.xmax * mesh_granularity)**0.5))
+        ny = max(1, int((self.ymax * mesh_granularity)**0.5))
+        # size of a single cell of the grid
+        self.cell_w = (self.xmax + 1) / nx
+        self.cell_h = (self.ymax + 1) / ny
+        # images are stored row by row i.e. (y, x)
+        self.H = np.zeros((ny, nx))
+        self.__generate_stamp()
+
+        # every typed charecter gets an index, filled in
+        # by __resolve, into these arrays holding the
+        # cells to stamp (the key and the shift key) and
+        # the distance of the key from the home row
+        self._char_to_idx = {}
+        # the same index keyed by ord for ascii charecters,
+        # -1 for charecters not resolved yet
+        self._ascii_idx = np.full(128, -1, dtype=np.int64)
+        self._key_cells = np.full((128, 2, 2), -1, dtype=np.int64)
+        self._key_dist = np.zeros(128, dtype=np.float64)
+
         # the intensity at the start is assumed to be zero
         # hard coding the expected bounds of the heatmap
         # we will clip all values greater than this bound
         bounds = np.linspace(0, 0.07, 10)
         norm = colors.BoundaryNorm(boundaries=bounds, ncolors=256,clip=True)
-        self.zi = np.zeros(self.xi.shape)
-        self.im = self.ax.pcolormesh(
-            self.xi, self.yi, self.zi, alpha= 0.7, cmap=self.cmap, zorder=1,
-            norm= norm,
+        # the grid is regular, so an image is much
+        # cheaper to update and blit than a mesh.
+        # the y axis is inverted, hence the extent
+        self.im = self.ax.imshow(
+            self.H, extent=(-1, self.xmax, self.ymax, -1), origin="upper",
+            alpha= 0.7, cmap=self.cmap, zorder=1,
+            norm= norm, interpolation="bilinear", aspect="auto",
             animated=True
         )
         
@@ -433,31 +481,53 @@ class Painter:
         self.__draw_artists()
         # update the figure with heatmap
         self.fig.canvas.blit(self.fig.bbox)
+
+        # the heatmap is redrawn at a fixed rate
+        # (~30 fps) instead of on every key press,
+        # so fast typing does not pile up redraws
+        self.dirty = False
+        # seconds between two frames, and when the last one was drawn
+        self.redraw_interval = 0.033
+        self.last_redraw = 0.0
+        self.timer = self.fig.canvas.new_timer(interval=int(self.redraw_interval * 1000))
+        self.timer.add_callback(self.__redraw)
+        self.timer.start()
         
     def close(self):
+        self.timer.stop()
+        # the last few key presses may not be drawn yet
+        self.im.set_data(self.H)
         print("Saving image to heatmap.png...")
         plt.savefig('heatmap.png')
         plt.close()
 
-    def __update_points(self, pos):
+    def __key_cell(self, pos):
         """
-        at the position pos, we add points
-        with a radial spread.
-        resulting in more density near pos
-        and gradually decreasing farther away
+        @brief: the cell of the grid containing the
+        center of the key at pos, this is where the
+        stamp is added when the key is pressed
         """
-        points = 1 # the no of points
-        distance = 0.1 # radius
-        delta = 2  # radius*=delta
-        while distance < 1:
-            points =  points*3 # reduce density
-            for point in range(points):
-                angle = 2 * np.pi * point / points
-                x = pos[0] + distance * np.cos(angle)
-                y = pos[1] + distance * np.sin(angle)
-                self.heatmap_pointsx.append(x)
-                self.heatmap_pointsy.append(y)
-            distance *= delta
+        ix = int((pos[0] + self.xsize / 2 + 1) / self.cell_w)
+        iy = int((pos[1] + self.ysize / 2 + 1) / self.cell_h)
+        return (ix, iy)
+
+    def __generate_stamp(self):
+        """
+        @brief: precomputes the gaussian added around
+        a key press, it is the same for every key
+        so we only do this once
+        """
+        # the stamp extends to 3 sigma on either side
+        rx = int(np.ceil(3 * self.sigma / self.cell_w))
+        ry = int(np.ceil(3 * self.sigma / self.cell_h))
+        xx = np.arange(-rx, rx + 1) * self.cell_w
+        yy = np.arange(-ry, ry + 1) * self.cell_h
+        # every key press carries (1 - decay) of the total
+        # heat, so the grid stays a density summing to ~1
+        weight = (1 - self.decay) / (2 * np.pi * self.sigma**2)
+        self.stamp = weight * np.exp(
+            -0.5 * (yy[:, None] ** 2 + xx[None, :] ** 2) / self.sigma**2
+        )
 
     def update_heatmap(self, chars):
         """
@@ -465,72 +535,103 @@ class Painter:
         when stdin is updated
         clear the axes and redraw the keyboard
         """
-        dist_travelled = 0.0
-        for char in chars:
-            if char in self.special_keys.keys():
-                # space, shift_l etc. keys need to be
-                # accounted for separately
-                # since the stdin will give \n for enter
-                # \b for backspace etc.
-                char = self.special_keys[char]
-
-            pos = find_nested_key(self.visual_keymap, char)
-            if pos is None:
-                # if char not found
-                # checking for shifted charecters
-                # position of the shift charecter used
-                for lower, upper in self.shift_mapping.items():
-                    if upper == char:
-                        pos = find_nested_key(self.visual_keymap, lower)
-                        if pos is not None:
-                            self.__update_points(
-                                (pos[0] + self.xsize / 2, pos[1] + self.ysize / 2)
-                            )
-                            shift_char = 'shift_r' if pos[0] < self.xmax/2 else 'shift_l'
-                            shift_pos = find_nested_key(self.visual_keymap, shift_char) 
-                            # adding heat to shift key as well
-                            self.__update_points((shift_pos[0] + self.xsize / 2, shift_pos[1] + self.ysize / 2))
-                            break
-                        else:
-                            print(f"{upper} not found", flush=True)
-            else:
-                self.__update_points((pos[0] + self.xsize / 2, pos[1] + self.ysize / 2))
-            dist_travelled += min([((pos[0]-home[0])**2 + (pos[1]-home[1])**2)**0.5 for home in self.home_row.values()])
-            
-        # once all the points in the heatmap are updated, draw it
-        x = np.array(self.heatmap_pointsx)
-        y = np.array(self.heatmap_pointsy)
-        
-        # we drop points once the size of the array
-        # gets larger that maxsize
-        # a larger value means the heatmap is more
-        # gradual in change thus capturing more keypresses
-        # while smaller size means the heatmap changes
-        # fast and looks really cool 
-        maxsize = 3000
-        if maxsize < x.size:
-            x = np.delete(x, np.s_[0 : x.size - maxsize])
-            y = np.delete(y, np.s_[0 : y.size - maxsize])
-            
-        # produces a gaussian distribution 
-        # based on the density of the points
-        k = gaussian_kde(np.vstack([x, y]))
-        
-        # sampling over a range
-        zi = k(np.vstack([self.xi.flatten(), self.yi.flatten()]))
-        
+        # fading out the older key presses
+        self.H *= self.decay ** len(chars)
+        try:
+            codes = self._ascii_idx[np.frombuffer(chars.encode('ascii'), dtype=np.uint8)]
+        except UnicodeEncodeError:
+            codes = np.full(len(chars), -1, dtype=np.int64)
+        # only charecters seen for the first time
+        # (or non ascii ones) need resolving
+        for i in np.flatnonzero(codes < 0):
+            codes[i] = self.__resolve(chars[i])
+        # resulting in more heat near the keys
+        # and gradually decreasing farther away
+        dist_travelled = process_keys(codes, self._key_cells, self._key_dist, self.H, self.stamp)
+
+        # once all the stamps are added, draw it right
+        # away unless a frame was drawn very recently,
+        # the timer will draw it on its next tick then
+        self.dirty = True
+        if time.monotonic() - self.last_redraw >= self.redraw_interval:
+            self.__redraw()
+        return dist_travelled
+
+    def process_events(self):
+        """
+        @brief: lets the gui handle its pending events,
+        the redraw timer only fires from here.
+        should be called regularly from the main loop
+        """
+        self.fig.canvas.flush_events()
+
+    def __redraw(self):
+        """
+        @brief: draws the heatmap if it changed since
+        the last call, driven by the redraw timer and
+        by update_heatmap
+        """
+        if not self.dirty:
+            return
+        self.dirty = False
         # restore the saved background
         self.fig.canvas.restore_region(self.bg) 
         # update the heatmap
-        self.im.set_array(zi.reshape(self.xi.shape))
+        self.im.set_data(self.H)
         # draw again 
         self.__draw_artists()
         self.fig.canvas.blit(self.fig.bbox)
-       
-        # make sure everything is shown 
-        self.fig.canvas.flush_events()
-        
-        return dist_travelled
+        self.last_redraw = time.monotonic()
+
+    def __resolve(self, char):
+        """
+        @brief: returns the index of char into the key
+        arrays, filling in the cells of the key and of
+        the shift key used to type it, if any.
+        the result is cached since the same charecters
+        are typed over and over
+        """
+        idx = self._char_to_idx.get(char)
+        if idx is not None:
+            return idx
+
+        key = char
+        if key in self.special_keys.keys():
+            # space, shift_l etc. keys need to be
+            # accounted for separately
+            # since the stdin will give \n for enter
+            # \b for backspace etc.
+            key = self.special_keys[key]
+
+        pos = self._flat_visual.get(key)
+        shift_pos = None
+        if pos is None:
+            # if char not found
+            # checking for shifted charecters
+            # position of the shift charecter used
+            lower = self._shift_inverse.get(key)
+            if lower is None:
+                raise ValueError(f"{char!r} is not on the keyboard")
+            pos = self._flat_visual[lower]
+            shift_char = 'shift_r' if pos[0] < self.xmax/2 else 'shift_l'
+            shift_pos = self._flat_visual.get(shift_char)
+
+        idx = len(self._char_to_idx)
+        if idx == self._key_dist.size:
+            # out of space, doubling the arrays
+            self._key_cells = np.concatenate((self._key_cells, np.full_like(self._key_cells, -1)))
+            self._key_dist = np.concatenate((self._key_dist, np.zeros_like(self._key_dist)))
+        self._key_cells[idx, 0] = self.__key_cell(pos)
+        if shift_pos is not None:
+            # adding heat to shift key as well
+            self._key_cells[idx, 1] = self.__key_cell(shift_pos)
+        d = self._home_xy - np.asarray(pos)
+        self._key_dist[idx] = np.sqrt(np.einsum('ij,ij->i', d, d)).min()
+
+        self._char_to_idx[char] = idx
+        if len(char) == 1 and ord(char) < 128:
+            self._ascii_idx[ord(char)] = idx
+        return idx
 
     def __draw_artists(self):
         self.ax.draw_artist(self.im)
@@ -542,7 +643,10 @@ class Painter:
         xdata = []
         ydata = []
         
-        xsize = self.xsize
+        # some parameters to draw boxes 
+        # around charecters and such
+        xsize0 = self.xsize
+        xsize = xsize0
         ysize = self.ysize
         xoffset = self.xoffset
         yoffset = self.yoffset
@@ -560,6 +664,9 @@ class Painter:
         
         plt.gca().invert_yaxis()  # if origin is on top left corner
         
+        # the key boxes are collected and added
+        # to the axes as a single artist
+        key_boxes = []
         for y, lst in ordered_keymap.items():
             # the second field is x coordinate
             sort_by_x = (lambda tup1: tup1[1])
@@ -575,21 +682,10 @@ class Painter:
             for char, x in lst:
                 xdata.append(max(x, prev_x + xsize + padding))
                 ydata.append(y)
-                # some parameters to draw boxes 
-                # around charecters and such
-                xsize = self.xsize
-                ysize = self.ysize
-                xoffset = self.xoffset
-                yoffset = self.yoffset
-                # padding for gap between two keys
-                padding = 0.3
 
                 # the first and the last keys are usually
                 # bigger
-                if count ==0:
-                    xsize+=1.5
-                if count == len(lst)-1:
-                    xsize+=1.2
+                xsize = xsize0 + (1.5 if count == 0 else 0) + (1.2 if count == len(lst)-1 else 0)
 
                 # saving the adjusted values
                 self.visual_keymap[y][char] = (xdata[-1], ydata[-1])
@@ -603,7 +699,7 @@ class Painter:
                 if char in self.home_row.keys():
                    ec="darkorange" 
                 # adding bounding box
-                self.ax.add_patch(
+                key_boxes.append(
                     patches.FancyBboxPatch(
                         (xdata[-1], ydata[-1]), xsize, ysize-padding, edgecolor=ec, facecolor="none", zorder=1,
                         boxstyle="Round, pad=0.1" 
@@ -619,18 +715,40 @@ class Painter:
                 )
                 prev_x = xdata[-1]
                 count+=1
+        self.ax.add_collection(PatchCollection(key_boxes, match_original=True, zorder=1))
         # drawing top left points
         # for some reason the canvas is not drawn
         # if this is not here
         plt.scatter(xdata, ydata)
 
+        # the rows do not matter while looking up
+        # a charecter, flattening them into one dictionary
+        self._flat_visual = {}
+        for row in self.visual_keymap.values():
+            self._flat_visual.update(row)
+        # upper:lower, only for keys present on the keyboard.
+        # if two keys share a shifted charecter the first one is used
+        self._shift_inverse = {}
+        for lower, upper in shift_mapping.items():
+            if lower in self._flat_visual:
+                self._shift_inverse.setdefault(upper, lower)
+
 class AsyncIO:
     """
     This class takes in charecters from the 
     standard input without waiting for an 
     EOL charecter. The implementation is 
-    different for windows and linux
+    different for windows and linux.
+    Use it as a context manager, the terminal
+    stays in raw mode until the block is exited
     """
+    # maximum no of charecters returned by
+    # a single call to getch on unix
+    max_batch = 64
+    # seconds getch waits for input
+    # before returning with nothing new
+    timeout = 0.05
+
     def set(self):
         # this is unix specific
         import sys, termios, tty
@@ -641,28 +759,53 @@ class AsyncIO:
             tty.setraw(sys.stdin.fileno())
         except Exception as err:
             print("initializing of asyncio failed ", err)
-    def getch(self, charecter_stream: string):
+
+    def __enter__(self):
         try:
-            # if linux
-            return self.getch_unix(charecter_stream)
+            self.set()
         except ImportError:
-            # else windows
+            # windows, msvcrt does not need raw mode
+            pass
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.reset()
+        return False
+
+    def getch(self, charecter_stream: string):
+        if os.name == "nt":
             return self.getch_win(charecter_stream)
+        return self.getch_unix(charecter_stream)
             
     def getch_win(self, charecter_stream: string):
         # this is windows specific
         import msvcrt
+        # polling instead of blocking in getch so that
+        # the redraw timer can fire between key presses
+        deadline = time.monotonic() + self.timeout
+        while not msvcrt.kbhit():
+            if time.monotonic() >= deadline:
+                return charecter_stream
+            time.sleep(0.005)
         charecter_stream += msvcrt.getch().decode('ASCII')
         return charecter_stream
             
     def getch_unix(self, charecter_stream: string):
         # this is unix specific
-        import sys, termios, tty
-        self.set()
-        charecter_stream += sys.stdin.read(1)
-        if "\r" in charecter_stream:
-            raise KeyboardInterrupt()
-        self.reset()
+        # the terminal is already in raw mode, see __enter__
+        import select
+        # everything typed since the last call is read
+        # at once so that the heatmap is updated once for all of it
+        ready, _, _ = select.select([self.fd], [], [], self.timeout)
+        if not ready:
+            return charecter_stream
+        data = os.read(self.fd, self.max_batch)
+        charecter_stream += data.decode('ascii', errors='ignore')
+        # anything typed after enter is dropped, the
+        # charecters before it are still handled by main
+        enter = charecter_stream.find("\r")
+        if enter != -1:
+            charecter_stream = charecter_stream[: enter + 1]
         return charecter_stream
 
     def reset(self):
@@ -674,6 +817,17 @@ class AsyncIO:
 
 
 
+def positive_int(value: str):
+    """
+    @brief: argparse type for options that
+    only make sense as a positive integer
+    """
+    number = int(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive integer")
+    return number
+
+
 def main():
     print("""
                     ***  Welcome to no mistaeks Typing!  ***
@@ -689,32 +843,47 @@ preparing a keyboard for you...""")
         description='keyboard heatmap generator',
     )
     cmdparser.add_argument('filename')
+    cmdparser.add_argument(
+        '--mesh', type=positive_int, default=200,
+        help='granularity of the heatmap mesh, lower is faster'
+    )
     args = cmdparser.parse_args()
     parser = xmlParser(args.filename)
-    painter = Painter(parser.keymap, parser.shift_mapping, parser.home_row)
+    painter = Painter(parser.keymap, parser.shift_mapping, parser.home_row, args.mesh)
     asyncio = AsyncIO()
     print("Start Typing, press Enter to stop...")
     
     distance_travelled = 0.0
     charecter_stream = ""
     try:
-        while True:
-            # main event loop
-            charecter_stream = asyncio.getch(charecter_stream)
-            if "\r" in charecter_stream:
-                raise KeyboardInterrupt()
-            print(charecter_stream[-1], flush=True , end="")
-            distance_travelled += painter.update_heatmap(charecter_stream)
-            # drop charecters after updated
-            # since we have no use for them
-            charecter_stream = ""
+        # the terminal is reset when leaving the block
+        with asyncio:
+            while True:
+                # main event loop
+                charecter_stream = asyncio.getch(charecter_stream)
+                # the heatmap is redrawn from here,
+                # also while nothing is being typed
+                painter.process_events()
+                if not charecter_stream:
+                    # nothing typed yet
+                    continue
+                # the charecters typed before enter
+                # still go into the heatmap
+                stop = "\r" in charecter_stream
+                charecter_stream = charecter_stream.split("\r", 1)[0]
+                if charecter_stream:
+                    print(charecter_stream, flush=True , end="")
+                    distance_travelled += painter.update_heatmap(charecter_stream)
+                if stop:
+                    raise KeyboardInterrupt()
+                # drop charecters after updated
+                # since we have no use for them
+                charecter_stream = ""
     except KeyboardInterrupt:
-        asyncio.reset()
         print("\nYour fingers travelled a total distance of: ", distance_travelled)
         painter.close()
         print("Shutting down...")
     except Exception as err:
-        asyncio.reset()
         print("giving up...did you press backspace?", err)
 
 if __name__ == "__main__":